@@ -1,5 +1,6 @@
 # DB connection setup
 import os
+from contextlib import contextmanager
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
@@ -10,16 +11,42 @@ load_dotenv()
 
 CONNECTION_STRING = os.getenv("DATABASE_URL")
 
-engine = create_engine(CONNECTION_STRING)
+# Route handlers are sync and run in the threadpool, which main.py sizes to
+# match this pool. That keeps handler threads from piling up on checkout, but
+# does not rule out waiting on pool_timeout: get_db releases its connection
+# only after the response is sent, and the /stream routes hold it for the
+# whole body, while the thread slot is already free.
+POOL_SIZE = 30
+MAX_OVERFLOW = 20
+
+engine = create_engine(
+    CONNECTION_STRING,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=30,
+    # Replace connections before server/proxy idle timeouts drop them
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    pool_use_lifo=True,
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
-def get_db():
+@contextmanager
+def session_scope():
+    """
+    Provide a session that is always closed (returned to the pool) on exit.
+    """
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_db():
+    with session_scope() as db:
+        yield db
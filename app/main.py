@@ -1,12 +1,27 @@
 # Entry point for FastAPI app
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-import app
+from app.db import MAX_OVERFLOW, POOL_SIZE
+from app.middleware import TimingMiddleware
 from app.routes import message, user
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Threadpool sized to the DB pool's capacity; see POOL_SIZE in app.db.
+    to_thread.current_default_thread_limiter().total_tokens = POOL_SIZE + MAX_OVERFLOW
+    yield
+
+
 app = FastAPI(
-    title="Messaging API", description="simple API for messaging", version="1.0.0"
+    title="Messaging API",
+    description="simple API for messaging",
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # add CORS middleware
@@ -18,6 +33,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request middleware must be pure ASGI (see app/middleware.py) and
+# registered with add_middleware; avoid @app.middleware("http").
+app.add_middleware(TimingMiddleware)
+
 app.include_router(user.router)
 app.include_router(message.router)
 
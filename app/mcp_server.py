@@ -1,28 +1,164 @@
-import json
-from datetime import datetime
+import heapq
+from datetime import datetime, timezone
+from itertools import islice
+from operator import itemgetter
 from typing import List, Optional
 from uuid import UUID
 
+import orjson
 from fastmcp import FastMCP
+from pydantic import TypeAdapter, ValidationError
 
-import app
-from app.db import get_db
+from app.db import session_scope
 from app.repositories.message_repository import MessageRepository
+from app.repositories.stats_repository import StatsRepository
 from app.repositories.user_repository import UserRepository
-from app.schemas import MessageCreate, UserCreate, UserPublic
+from app.schemas import InboxMessage, MessageCreate, UserCreate
 
+mcp = FastMCP("Messaging API")
 
-def get_user_repository():
-    db = next(get_db())
-    return UserRepository(db)
+# Tool arguments arrive as strings; parse IDs with pydantic-core before any query
+_UUID_ADAPTER = TypeAdapter(UUID)
 
 
-def get_message_repository():
-    db = next(get_db())
-    return MessageRepository(db)
+def _parse_uuid(value: str, label: str) -> UUID:
+    """Parse an ID argument, raising ValueError with a short message if invalid."""
+    try:
+        return _UUID_ADAPTER.validate_python(value)
+    except ValidationError:
+        raise ValueError(f"Invalid {label}: {value}")
 
 
-mcp = FastMCP("Messaging API")
+def _dumps(data) -> str:
+    """Serialize tool output; orjson handles UUID and datetime values natively."""
+    return orjson.dumps(
+        data, option=orjson.OPT_INDENT_2 | orjson.OPT_NAIVE_UTC
+    ).decode()
+
+
+def _get_users_data(user_id: Optional[str] = None) -> list[dict] | dict | None:
+    with session_scope() as db:
+        if user_id:
+            # Get specific user by ID
+            user = UserRepository.get_user_by_id(db, _parse_uuid(user_id, "user ID"))
+            if not user:
+                return None
+
+            return {"id": user.id, "name": user.name, "email": user.email}
+
+        # Get all users
+        return [
+            {"id": user.id, "name": user.name, "email": user.email}
+            for user in UserRepository.get_users(db)
+        ]
+
+
+def _get_messages_data(
+    user_email: str, since: Optional[datetime] = None, limit: int = 100
+) -> list[dict]:
+    with session_scope() as db:
+        repo = MessageRepository(db)
+        sent_messages = repo.get_sent_messages(user_email, since, limit)
+        inbox_messages = repo.get_inbox_messages(user_email, since, limit)
+
+    sent_data = (
+        {
+            "id": msg.id,
+            "type": "sent",
+            "subject": msg.subject,
+            "content": msg.content,
+            "recipient_emails": msg.recipient_emails,
+            "timestamp": msg.timestamp,
+        }
+        for msg in sent_messages
+    )
+    received_data = (
+        {
+            "id": msg.id,
+            "type": "received",
+            "subject": msg.subject,
+            "content": msg.content,
+            "sender_email": msg.sender_email,
+            "timestamp": msg.timestamp,
+            "read": msg.read,
+            "read_at": msg.read_at,
+        }
+        for msg in inbox_messages
+    )
+
+    # Both lists already come back newest first, so merge instead of sorting
+    merged = heapq.merge(
+        sent_data, received_data, key=itemgetter("timestamp"), reverse=True
+    )
+    return list(islice(merged, limit))
+
+
+def _get_sent_messages_data(
+    sender_email: str, since: Optional[datetime] = None, limit: int = 100
+) -> list[dict]:
+    with session_scope() as db:
+        repo = MessageRepository(db)
+        sent_messages = repo.get_sent_messages(sender_email, since, limit)
+
+    return [
+        {
+            "id": msg.id,
+            "subject": msg.subject,
+            "content": msg.content,
+            "recipient_emails": msg.recipient_emails,
+            "timestamp": msg.timestamp,
+        }
+        for msg in sent_messages
+    ]
+
+
+def _inbox_message_data(msg: InboxMessage) -> dict:
+    return {
+        "id": msg.id,
+        "subject": msg.subject,
+        "content": msg.content,
+        "sender_email": msg.sender_email,
+        "timestamp": msg.timestamp,
+        "read": msg.read,
+        "read_at": msg.read_at,
+    }
+
+
+def _get_inbox_messages_data(
+    recipient_email: str, since: Optional[datetime] = None, limit: int = 100
+) -> list[dict]:
+    with session_scope() as db:
+        repo = MessageRepository(db)
+        inbox_messages = repo.get_inbox_messages(recipient_email, since, limit)
+
+    return [_inbox_message_data(msg) for msg in inbox_messages]
+
+
+def _get_unread_messages_data(recipient_email: str) -> list[dict]:
+    with session_scope() as db:
+        repo = MessageRepository(db)
+        unread_messages = repo.get_unread_messages(recipient_email)
+
+    return [_inbox_message_data(msg) for msg in unread_messages]
+
+
+def _get_message_detail_data(message_id: str) -> dict:
+    message_uuid = _parse_uuid(message_id, "message ID")
+    with session_scope() as db:
+        repo = MessageRepository(db)
+        message_detail = repo.get_message_detail(message_uuid)
+
+    return {
+        "id": message_detail.id,
+        "subject": message_detail.subject,
+        "content": message_detail.content,
+        "sender_email": message_detail.sender_email,
+        "timestamp": message_detail.timestamp,
+        "recipients": [
+            {"email": r.email, "read": r.read, "read_at": r.read_at}
+            for r in message_detail.recipients
+        ],
+    }
 
 
 @mcp.tool()
@@ -31,10 +167,10 @@ def create_user(name: str, email: str) -> str:
     Create a new user with the given name and email.
     """
     try:
-        repo = get_user_repository()
-        user_data = UserCreate(name=name, email=email)
-        user = repo.create_user(user_data)
-        return f"User '{user.name}' with email '{user.email}' created successfully. ID: {user.id}"
+        with session_scope() as db:
+            user_data = UserCreate(name=name, email=email)
+            user = UserRepository.create_user(db, user_data)
+            return f"User '{user.name}' with email '{user.email}' created successfully. ID: {user.id}"
     except ValueError as e:
         return f"Error creating user: {str(e)}"
     except Exception as e:
@@ -47,31 +183,11 @@ def get_users(user_id: Optional[str] = None) -> str:
     Get all users or a specific user by ID.
     """
     try:
-        repo = get_user_repository()
-
-        if user_id:
-            # Get specific user by ID
-            user_uuid = UUID(user_id)
-            user = repo.get_user_by_id(user_uuid)
-
-            if not user:
-                return "User not found"
-
-            user_data = {"id": str(user.id), "name": user.name, "email": user.email}
-
-            return json.dumps(user_data, indent=2)
-        else:
-            # Get all users
-            users = repo.get_users()
-
-            users_data = []
-            for user in users:
-                users_data.append(
-                    {"id": str(user.id), "name": user.name, "email": user.email}
-                )
-
-            return json.dumps(users_data, indent=2)
+        users_data = _get_users_data(user_id)
+        if users_data is None:
+            return "User not found"
 
+        return _dumps(users_data)
     except ValueError as e:
         return f"Error retrieving users: {str(e)}"
     except Exception as e:
@@ -89,17 +205,18 @@ def send_message(
     Send a message to one or more recipients using email addresses.
     """
     try:
-        repo = get_message_repository()
-        message_data = MessageCreate(
-            sender_email=sender_email,
-            recipient_emails=recipient_emails,
-            content=content,
-            subject=subject,
-        )
-        sent_message = repo.send_message(message_data)
-
-        recipients_str = ", ".join(recipient_emails)
-        return f"Message sent successfully to {recipients_str}. Message ID: {sent_message.id}"
+        with session_scope() as db:
+            repo = MessageRepository(db)
+            message_data = MessageCreate(
+                sender_email=sender_email,
+                recipient_emails=recipient_emails,
+                content=content,
+                subject=subject,
+            )
+            sent_message = repo.send_message(message_data)
+
+            recipients_str = ", ".join(recipient_emails)
+            return f"Message sent successfully to {recipients_str}. Message ID: {sent_message.id}"
     except ValueError as e:
         return f"Error sending message: {str(e)}"
     except Exception as e:
@@ -107,48 +224,15 @@ def send_message(
 
 
 @mcp.tool()
-def get_messages(user_email: str) -> str:
+def get_messages(
+    user_email: str, since: Optional[datetime] = None, limit: int = 100
+) -> str:
     """
-    Get all messages for a user (both sent and received) using email address.
+    Get the most recent messages for a user (both sent and received) using
+    email address, optionally only those sent since a given time.
     """
     try:
-        repo = get_message_repository()
-
-        sent_messages = repo.get_sent_messages(user_email)
-
-        inbox_messages = repo.get_inbox_messages(user_email)
-
-        all_messages = []
-
-        for msg in sent_messages:
-            all_messages.append(
-                {
-                    "id": str(msg.id),
-                    "type": "sent",
-                    "subject": msg.subject,
-                    "content": msg.content,
-                    "recipient_emails": msg.recipient_emails,
-                    "timestamp": str(msg.timestamp),
-                }
-            )
-
-        for msg in inbox_messages:
-            all_messages.append(
-                {
-                    "id": str(msg.id),
-                    "type": "received",
-                    "subject": msg.subject,
-                    "content": msg.content,
-                    "sender_email": msg.sender_email,
-                    "timestamp": str(msg.timestamp),
-                    "read": msg.read,
-                    "read_at": str(msg.read_at) if msg.read_at else None,
-                }
-            )
-
-        all_messages.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-
-        return json.dumps(all_messages, indent=2)
+        return _dumps(_get_messages_data(user_email, since, limit))
     except ValueError as e:
         return f"Error retrieving messages: {str(e)}"
     except Exception as e:
@@ -161,9 +245,11 @@ def mark_message_read(message_id: str, recipient_email: str) -> str:
     Mark a message as read using message ID and recipient email.
     """
     try:
-        repo = get_message_repository()
-        repo.mark_message_as_read(message_id, recipient_email)
-        return f"Message {message_id} marked as read successfully"
+        message_uuid = _parse_uuid(message_id, "message ID")
+        with session_scope() as db:
+            repo = MessageRepository(db)
+            repo.mark_message_as_read(message_uuid, recipient_email)
+            return f"Message {message_id} marked as read successfully"
     except ValueError as e:
         return f"Error marking message as read: {str(e)}"
     except Exception as e:
@@ -176,24 +262,7 @@ def get_unread_messages(recipient_email: str) -> str:
     Get all unread messages for a user using email address.
     """
     try:
-        repo = get_message_repository()
-        unread_messages = repo.get_unread_messages(recipient_email)
-
-        messages_data = []
-        for msg in unread_messages:
-            messages_data.append(
-                {
-                    "id": str(msg.id),
-                    "subject": msg.subject,
-                    "content": msg.content,
-                    "sender_email": msg.sender_email,
-                    "timestamp": str(msg.timestamp),
-                    "read": msg.read,
-                    "read_at": str(msg.read_at) if msg.read_at else None,
-                }
-            )
-
-        return json.dumps(messages_data, indent=2)
+        return _dumps(_get_unread_messages_data(recipient_email))
     except ValueError as e:
         return f"Error retrieving unread messages: {str(e)}"
     except Exception as e:
@@ -201,27 +270,14 @@ def get_unread_messages(recipient_email: str) -> str:
 
 
 @mcp.tool()
-def get_sent_messages(sender_email: str) -> str:
+def get_sent_messages(
+    sender_email: str, since: Optional[datetime] = None, limit: int = 100
+) -> str:
     """
-    Get all messages sent by a user using email address.
+    Get the most recent messages sent by a user using email address.
     """
     try:
-        repo = get_message_repository()
-        sent_messages = repo.get_sent_messages(sender_email)
-
-        messages_data = []
-        for msg in sent_messages:
-            messages_data.append(
-                {
-                    "id": str(msg.id),
-                    "subject": msg.subject,
-                    "content": msg.content,
-                    "recipient_emails": msg.recipient_emails,
-                    "timestamp": str(msg.timestamp),
-                }
-            )
-
-        return json.dumps(messages_data, indent=2)
+        return _dumps(_get_sent_messages_data(sender_email, since, limit))
     except ValueError as e:
         return f"Error retrieving sent messages: {str(e)}"
     except Exception as e:
@@ -229,29 +285,14 @@ def get_sent_messages(sender_email: str) -> str:
 
 
 @mcp.tool()
-def get_inbox_messages(recipient_email: str) -> str:
+def get_inbox_messages(
+    recipient_email: str, since: Optional[datetime] = None, limit: int = 100
+) -> str:
     """
-    Get all messages received by a user using email address.
+    Get the most recent messages received by a user using email address.
     """
     try:
-        repo = get_message_repository()
-        inbox_messages = repo.get_inbox_messages(recipient_email)
-
-        messages_data = []
-        for msg in inbox_messages:
-            messages_data.append(
-                {
-                    "id": str(msg.id),
-                    "subject": msg.subject,
-                    "content": msg.content,
-                    "sender_email": msg.sender_email,
-                    "timestamp": str(msg.timestamp),
-                    "read": msg.read,
-                    "read_at": str(msg.read_at) if msg.read_at else None,
-                }
-            )
-
-        return json.dumps(messages_data, indent=2)
+        return _dumps(_get_inbox_messages_data(recipient_email, since, limit))
     except ValueError as e:
         return f"Error retrieving inbox messages: {str(e)}"
     except Exception as e:
@@ -264,26 +305,7 @@ def get_message_detail(message_id: str) -> str:
     Get detailed information about a specific message using message ID.
     """
     try:
-        repo = get_message_repository()
-        message_detail = repo.get_message_detail(message_id)
-
-        detail_data = {
-            "id": str(message_detail.id),
-            "subject": message_detail.subject,
-            "content": message_detail.content,
-            "sender_email": message_detail.sender_email,
-            "timestamp": str(message_detail.timestamp),
-            "recipients": [
-                {
-                    "email": r.email,
-                    "read": r.read,
-                    "read_at": str(r.read_at) if r.read_at else None,
-                }
-                for r in message_detail.recipients
-            ],
-        }
-
-        return json.dumps(detail_data, indent=2)
+        return _dumps(_get_message_detail_data(message_id))
     except ValueError as e:
         return f"Error retrieving message detail: {str(e)}"
     except Exception as e:
@@ -299,43 +321,29 @@ def get_all_users_resource() -> str:
 @mcp.resource("user://{user_id}")
 def get_user_resource(user_id: str) -> str:
     """Resource containing a specific user's information."""
-    user_data = get_users(user_id)
-
-    if "User not found" in user_data:
-        return user_data
-
     try:
-        user_json = json.loads(user_data)
+        user_data = _get_users_data(user_id)
+        if user_data is None:
+            return "User not found"
 
-        sent_count = len(json.loads(get_sent_messages(user_json["email"])))
-        inbox_count = len(json.loads(get_inbox_messages(user_json["email"])))
-        unread_count = len(json.loads(get_unread_messages(user_json["email"])))
+        with session_scope() as db:
+            user_stats = StatsRepository(db).user_stats(user_data["id"])
+        user_data["profile"] = user_stats.model_dump()
 
-        user_json["profile"] = {
-            "messages_sent": sent_count,
-            "messages_received": inbox_count,
-            "unread_count": unread_count,
-        }
-
-        return json.dumps(user_json, indent=2)
-    except:
-        return user_data
+        return _dumps(user_data)
+    except Exception as e:
+        return f"Error loading user resource: {str(e)}"
 
 
 @mcp.resource("messages://all")
 def get_all_messages_resource() -> str:
     """Resource containing all messages in the system."""
     try:
-        users_data = json.loads(get_users())
-        all_messages = []
-
-        for user in users_data:
-            user_messages = json.loads(get_messages(user["email"]))
-            all_messages.extend(user_messages)
+        with session_scope() as db:
+            repo = MessageRepository(db)
+            messages = repo.get_all_messages_ordered()
 
-        all_messages.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-
-        return json.dumps(all_messages, indent=2)
+        return _dumps([msg.model_dump() for msg in messages])
     except Exception as e:
         return f"Error loading messages resource: {str(e)}"
 
@@ -358,38 +366,33 @@ def get_user_unread_resource(user_email: str) -> str:
 @mcp.resource("message://{message_id}")
 def get_message_resource(message_id: str) -> str:
     """Resource containing detailed information about a specific message."""
-    message_data = get_message_detail(message_id)
-
     try:
-        message_json = json.loads(message_data)
+        message_data = _get_message_detail_data(message_id)
 
-        recipients = message_json.get("recipients", [])
-        message_json["metadata"] = {
+        recipients = message_data["recipients"]
+        read_count = sum(1 for r in recipients if r["read"])
+        message_data["metadata"] = {
             "total_recipients": len(recipients),
-            "read_count": sum(1 for r in recipients if r.get("read", False)),
-            "unread_count": sum(1 for r in recipients if not r.get("read", False)),
+            "read_count": read_count,
+            "unread_count": len(recipients) - read_count,
         }
 
-        return json.dumps(message_json, indent=2)
-    except:
-        return message_data
+        return _dumps(message_data)
+    except Exception as e:
+        return f"Error loading message resource: {str(e)}"
 
 
 @mcp.resource("stats://system")
 def get_system_stats_resource() -> str:
     """Resource containing system-wide statistics."""
     try:
-        users_data = json.loads(get_users())
-        total_users = len(users_data)
-
-        total_messages = 0
-        total_unread = 0
+        with session_scope() as db:
+            repo = StatsRepository(db)
+            stats = repo.system_stats()
 
-        for user in users_data:
-            sent_count = len(json.loads(get_sent_messages(user["email"])))
-            unread_count = len(json.loads(get_unread_messages(user["email"])))
-            total_messages += sent_count
-            total_unread += unread_count
+        total_users = stats.total_users
+        total_messages = stats.total_messages
+        total_unread = stats.total_unread_messages
 
         stats_data = {
             "system_statistics": {
@@ -399,11 +402,11 @@ def get_system_stats_resource() -> str:
                 "average_messages_per_user": (
                     round(total_messages / total_users, 2) if total_users > 0 else 0
                 ),
-                "last_updated": str(datetime.now()),
+                "last_updated": datetime.now(timezone.utc),
             }
         }
 
-        return json.dumps(stats_data, indent=2)
+        return _dumps(stats_data)
     except Exception as e:
         return f"Error loading system stats resource: {str(e)}"
 
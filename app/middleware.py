@@ -0,0 +1,31 @@
+# Pure ASGI middleware
+from time import perf_counter
+
+
+class TimingMiddleware:
+    """
+    Add an X-Response-Time header to every HTTP response.
+
+    Written as a plain ASGI app instead of @app.middleware("http"), which wraps
+    requests in BaseHTTPMiddleware and streams bodies through an extra memory
+    channel on every call.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                elapsed_ms = (perf_counter() - start) * 1000
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-response-time", f"{elapsed_ms:.2f}ms".encode())
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
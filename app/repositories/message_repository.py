@@ -1,16 +1,91 @@
+from collections.abc import Iterator
 from datetime import datetime
+from uuid import UUID, uuid4
 
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
 
-import app
 from app.models import Message, MessageRecipient, User
-from app.schemas import (InboxMessage, MessageCreate, MessageDetail,
-                         MessageRecipientInfo, SentMessage)
+from app.schemas import (
+    InboxMessage,
+    InboxMessageListAdapter,
+    InboxPreview,
+    InboxPreviewListAdapter,
+    MessageCreate,
+    MessageDetail,
+    MessageRecipientInfo,
+    SentMessage,
+    SentMessageListAdapter,
+)
+
+# Rows fetched per round trip when streaming message history
+STREAM_BATCH_SIZE = 500
+
+# Newest first; id breaks ties between messages sharing a timestamp (e.g. sent
+# in one transaction) so limit/since paging is deterministic.
+_NEWEST_FIRST = (Message.timestamp.desc(), Message.id.desc())
+
+# Inbox rows as plain columns named after InboxMessage fields; no ORM
+# entities are loaded, only the values the response carries.
+_INBOX_SELECT = (
+    select(
+        Message.id,
+        User.email.label("sender_email"),
+        Message.subject,
+        Message.content,
+        Message.timestamp,
+        MessageRecipient.read,
+        MessageRecipient.read_at,
+    )
+    .select_from(MessageRecipient)
+    .join(Message, MessageRecipient.message_id == Message.id)
+    .join(User, Message.sender_id == User.id)
+)
+
+# Built once at import; each call only binds the recipient id.
+_UNREAD_STMT = _INBOX_SELECT.where(
+    MessageRecipient.recipient_id == bindparam("recipient_id"),
+    MessageRecipient.read.is_(False),
+).order_by(*_NEWEST_FIRST)
+
+
+def _sent_message_data(message: Message, sender_email: str) -> dict:
+    """
+    Flatten a loaded Message into SentMessage fields.
+    """
+    return {
+        "id": message.id,
+        "sender_email": sender_email,
+        "recipient_emails": [
+            recipient.recipient.email for recipient in message.recipients
+        ],
+        "subject": message.subject,
+        "content": message.content,
+        "timestamp": message.timestamp,
+    }
 
 
 class MessageRepository:
     def __init__(self, db_session: Session):
         self.db_session = db_session
+        # Request-scoped email -> user id lookups
+        self._email_cache: dict[str, UUID | None] = {}
+
+    def _resolve_user_id(self, email: str) -> UUID | None:
+        """
+        Resolve an email to a user ID, selecting only the id column.
+
+        Args:
+            email (str): The email of the user.
+
+        Returns:
+            UUID | None: The user ID if the user exists, otherwise None.
+        """
+        if email not in self._email_cache:
+            self._email_cache[email] = (
+                self.db_session.query(User.id).filter(User.email == email).scalar()
+            )
+        return self._email_cache[email]
 
     def send_message(self, message_data: MessageCreate) -> SentMessage:
         """
@@ -22,170 +97,273 @@ class MessageRepository:
         Returns:
             SentMessage: The sent message details.
         """
-        sender = (
-            self.db_session.query(User)
-            .filter(User.email == message_data.sender_email)
-            .first()
+        # Resolve the sender and every recipient with a single query.
+        email_to_id = dict(
+            self.db_session.query(User.email, User.id)
+            .filter(
+                User.email.in_(
+                    [message_data.sender_email, *message_data.recipient_emails]
+                )
+            )
+            .all()
         )
-        if not sender:
+        self._email_cache.update(email_to_id)
+        if message_data.sender_email not in email_to_id:
             raise ValueError("Sender does not exist.")
 
-        new_message = Message(
-            sender_id=sender.id,
+        # Report every unknown recipient at once, not just the first.
+        missing = [
+            email
+            for email in dict.fromkeys(message_data.recipient_emails)
+            if email not in email_to_id
+        ]
+        if missing:
+            raise ValueError(f"Recipients do not exist: {', '.join(missing)}.")
+
+        # The id is generated here so the recipient rows can reference it
+        # straight away; only the server-side timestamp needs RETURNING.
+        # Only pass fields the client sent so column defaults stay in charge.
+        message_id = uuid4()
+        timestamp = self.db_session.execute(
+            insert(Message)
+            .values(
+                id=message_id,
+                sender_id=email_to_id[message_data.sender_email],
+                **message_data.model_dump(
+                    include={"subject", "content"}, exclude_unset=True
+                ),
+            )
+            .returning(Message.timestamp)
+        ).scalar_one()
+
+        # ORM bulk INSERT: plain dicts batched into multi-row VALUES,
+        # no per-row unit-of-work bookkeeping.
+        self.db_session.execute(
+            insert(MessageRecipient),
+            [
+                {
+                    "message_id": message_id,
+                    "recipient_id": email_to_id[recipient_email],
+                }
+                for recipient_email in message_data.recipient_emails
+            ],
+        )
+
+        sent_message = SentMessage(
+            id=message_id,
+            sender_email=message_data.sender_email,
+            recipient_emails=message_data.recipient_emails,
             subject=message_data.subject,
             content=message_data.content,
+            timestamp=timestamp,
         )
-
-        self.db_session.add(new_message)
         self.db_session.commit()
-        self.db_session.refresh(new_message)
 
-        for recipient_email in message_data.recipient_emails:
-            recipient = (
-                self.db_session.query(User)
-                .filter(User.email == recipient_email)
-                .first()
-            )
-            if not recipient:
-                raise ValueError(f"Recipient {recipient_email} does not exist.")
+        return sent_message
 
-            new_recipient = MessageRecipient(
-                message_id=new_message.id, recipient_id=recipient.id
+    def _sent_messages_query(self, sender_id: UUID, since: datetime | None):
+        """
+        Build the newest-first query for a sender's messages.
+        """
+        # Recipients come from a second SELECT ... WHERE message_id IN (...)
+        # rather than a join that would repeat each message once per recipient.
+        # raiseload turns any other relationship access into an error, not a query.
+        query = (
+            self.db_session.query(Message)
+            .options(
+                selectinload(Message.recipients).joinedload(MessageRecipient.recipient),
+                raiseload("*"),
             )
-            self.db_session.add(new_recipient)
-
-        self.db_session.commit()
-
-        return SentMessage(
-            id=new_message.id,
-            sender_email=sender.email,
-            recipient_emails=message_data.recipient_emails,
-            subject=message_data.subject,
-            content=message_data.content,
-            timestamp=new_message.timestamp,
+            .filter(Message.sender_id == sender_id)
         )
+        if since is not None:
+            query = query.filter(Message.timestamp >= since)
+        return query.order_by(*_NEWEST_FIRST)
 
-    def get_sent_messages(self, sender_email: str) -> list[SentMessage]:
+    def _inbox_messages_stmt(self, recipient_id: UUID, since: datetime | None):
+        """
+        Build the newest-first column select for a recipient's inbox.
         """
-        Retrieve all sent messages for a given sender.
+        stmt = _INBOX_SELECT.where(MessageRecipient.recipient_id == recipient_id)
+        if since is not None:
+            stmt = stmt.where(Message.timestamp >= since)
+        return stmt.order_by(*_NEWEST_FIRST)
+
+    def get_sent_messages(
+        self, sender_email: str, since: datetime | None = None, limit: int = 100
+    ) -> list[SentMessage]:
+        """
+        Retrieve the most recent sent messages for a given sender.
 
         Args:
             sender_email (str): The email of the sender.
+            since (datetime | None): Only include messages sent at or after this time.
+            limit (int): Maximum number of messages to return, newest first.
 
         Returns:
             list[SentMessage]: List of sent messages.
         """
-        sender = self.db_session.query(User).filter(User.email == sender_email).first()
-        if not sender:
+        sender_id = self._resolve_user_id(sender_email)
+        if not sender_id:
             raise ValueError("Sender does not exist.")
 
-        messages = (
-            self.db_session.query(Message).filter(Message.sender_id == sender.id).all()
+        messages = self._sent_messages_query(sender_id, since).limit(limit).all()
+        return SentMessageListAdapter.validate_python(
+            [_sent_message_data(message, sender_email) for message in messages]
         )
 
-        return [
-            SentMessage(
-                id=message.id,
-                sender_email=sender_email,
-                recipient_emails=[
-                    recipient.recipient.email for recipient in message.recipients
-                ],
-                subject=message.subject,
-                content=message.content,
-                timestamp=message.timestamp,
-            )
-            for message in messages
-        ]
+    def stream_sent_messages(
+        self, sender_email: str, since: datetime | None = None
+    ) -> Iterator[SentMessage]:
+        """
+        Lazily yield every sent message for a given sender, newest first.
+
+        Rows are fetched STREAM_BATCH_SIZE at a time from a server-side cursor,
+        so the session must stay open until the iterator is exhausted.
+
+        Args:
+            sender_email (str): The email of the sender.
+            since (datetime | None): Only include messages sent at or after this time.
+
+        Returns:
+            Iterator[SentMessage]: Sent messages, one at a time.
+        """
+        sender_id = self._resolve_user_id(sender_email)
+        if not sender_id:
+            raise ValueError("Sender does not exist.")
+
+        query = self._sent_messages_query(sender_id, since).yield_per(STREAM_BATCH_SIZE)
+        return (
+            SentMessage.model_validate(_sent_message_data(message, sender_email))
+            for message in query
+        )
 
-    def get_inbox_messages(self, recipient_email: str) -> list[InboxMessage]:
+    def get_inbox_messages(
+        self, recipient_email: str, since: datetime | None = None, limit: int = 100
+    ) -> list[InboxMessage]:
         """
-        Retrieve all messages in the inbox for a given recipient.
+        Retrieve the most recent messages in the inbox for a given recipient.
 
         Args:
             recipient_email (str): The email of the recipient.
+            since (datetime | None): Only include messages sent at or after this time.
+            limit (int): Maximum number of messages to return, newest first.
         Returns:
             list[InboxMessage]: List of inbox messages.
         """
-        recipient = (
-            self.db_session.query(User).filter(User.email == recipient_email).first()
-        )
-        if not recipient:
+        recipient_id = self._resolve_user_id(recipient_email)
+        if not recipient_id:
             raise ValueError("Recipient does not exist.")
 
-        message_recipients = (
-            self.db_session.query(MessageRecipient)
-            .filter(MessageRecipient.recipient_id == recipient.id)
-            .all()
-        )
-        messages = []
-        for message_recipient in message_recipients:
-            message = message_recipient.message
-            messages.append(
-                InboxMessage(
-                    id=message.id,
-                    sender_email=message.sender.email,
-                    subject=message.subject,
-                    content=message.content,
-                    timestamp=message.timestamp,
-                    read=message_recipient.read,
-                    read_at=message_recipient.read_at,
-                )
-            )
-        return messages
+        rows = self.db_session.execute(
+            self._inbox_messages_stmt(recipient_id, since).limit(limit)
+        ).all()
+        return InboxMessageListAdapter.validate_python(rows, from_attributes=True)
 
-    def get_unread_messages(self, recipient_email: str) -> list[InboxMessage]:
+    def stream_inbox_messages(
+        self, recipient_email: str, since: datetime | None = None
+    ) -> Iterator[InboxMessage]:
         """
-        Retrieve all unread messages in the inbox for a given recipient.
+        Lazily yield every inbox message for a given recipient, newest first.
+
+        Rows are fetched STREAM_BATCH_SIZE at a time from a server-side cursor,
+        so the session must stay open until the iterator is exhausted.
 
         Args:
             recipient_email (str): The email of the recipient.
+            since (datetime | None): Only include messages sent at or after this time.
 
         Returns:
-            list[InboxMessage]: List of unread inbox messages.
+            Iterator[InboxMessage]: Inbox messages, one at a time.
         """
-        recipient = (
-            self.db_session.query(User).filter(User.email == recipient_email).first()
-        )
-        if not recipient:
+        recipient_id = self._resolve_user_id(recipient_email)
+        if not recipient_id:
             raise ValueError("Recipient does not exist.")
 
-        message_recipients = (
-            self.db_session.query(MessageRecipient)
-            .filter(
-                MessageRecipient.recipient_id == recipient.id,
-                MessageRecipient.read == False,
+        rows = self.db_session.execute(
+            self._inbox_messages_stmt(recipient_id, since).execution_options(
+                yield_per=STREAM_BATCH_SIZE
             )
-            .all()
         )
+        return (InboxMessage.model_validate(row) for row in rows)
 
-        messages = []
-        for message_recipient in message_recipients:
-            message = message_recipient.message
-            messages.append(
-                InboxMessage(
-                    id=message.id,
-                    sender_email=message.sender.email,
-                    subject=message.subject,
-                    content=message.content,
-                    timestamp=message.timestamp,
-                    read=message_recipient.read,
-                    read_at=message_recipient.read_at,
-                )
+    def list_inbox_previews(
+        self, recipient_email: str, since: datetime | None = None, limit: int = 100
+    ) -> list[InboxPreview]:
+        """
+        Retrieve inbox previews (no message body) for a given recipient.
+
+        Args:
+            recipient_email (str): The email of the recipient.
+            since (datetime | None): Only include messages sent at or after this time.
+            limit (int): Maximum number of previews to return, newest first.
+
+        Returns:
+            list[InboxPreview]: List of inbox previews.
+        """
+        recipient_id = self._resolve_user_id(recipient_email)
+        if not recipient_id:
+            raise ValueError("Recipient does not exist.")
+
+        # Select just the preview columns so message content never leaves the DB;
+        # labels match InboxPreview fields, as in _INBOX_SELECT.
+        stmt = (
+            select(
+                Message.id,
+                User.email.label("sender_email"),
+                Message.subject,
+                Message.timestamp,
+                MessageRecipient.read,
             )
-        return messages
+            .select_from(MessageRecipient)
+            .join(Message, MessageRecipient.message_id == Message.id)
+            .join(User, Message.sender_id == User.id)
+            .where(MessageRecipient.recipient_id == recipient_id)
+        )
+        if since is not None:
+            stmt = stmt.where(Message.timestamp >= since)
+        rows = self.db_session.execute(stmt.order_by(*_NEWEST_FIRST).limit(limit)).all()
+        return InboxPreviewListAdapter.validate_python(rows, from_attributes=True)
+
+    def get_unread_messages(self, recipient_email: str) -> list[InboxMessage]:
+        """
+        Retrieve all unread messages in the inbox for a given recipient, newest first.
+
+        Args:
+            recipient_email (str): The email of the recipient.
 
-    def get_message_detail(self, message_id: str) -> MessageDetail:
+        Returns:
+            list[InboxMessage]: List of unread inbox messages.
+        """
+        recipient_id = self._resolve_user_id(recipient_email)
+        if not recipient_id:
+            raise ValueError("Recipient does not exist.")
+
+        rows = self.db_session.execute(
+            _UNREAD_STMT, {"recipient_id": recipient_id}
+        ).all()
+        return InboxMessageListAdapter.validate_python(rows, from_attributes=True)
+
+    def get_message_detail(self, message_id: UUID) -> MessageDetail:
         """
         Retrieve recipients about a specific message.
 
         Args:
-            message_id (str): The ID of the message to retrieve.
+            message_id (UUID): The ID of the message to retrieve.
 
         Returns:
             MessageDetail: Detailed information about the message.
         """
+        # A single row, so join everything in one round trip.
         message = (
-            self.db_session.query(Message).filter(Message.id == message_id).first()
+            self.db_session.query(Message)
+            .options(
+                joinedload(Message.sender),
+                joinedload(Message.recipients).joinedload(MessageRecipient.recipient),
+                raiseload("*"),
+            )
+            .filter(Message.id == message_id)
+            .first()
         )
         if not message:
             raise ValueError("Message does not exist.")
@@ -208,37 +386,85 @@ class MessageRepository:
             recipients=recipients_info,
         )
 
-    def mark_message_as_read(self, message_id: str, recipient_email: str) -> None:
+    def get_all_messages_ordered(self) -> list[MessageDetail]:
+        """
+        Retrieve every message in the system, newest first.
+
+        Returns:
+            list[MessageDetail]: All messages with their recipients.
+        """
+        messages = (
+            self.db_session.query(Message)
+            .options(
+                joinedload(Message.sender),
+                selectinload(Message.recipients).joinedload(MessageRecipient.recipient),
+                raiseload("*"),
+            )
+            .order_by(*_NEWEST_FIRST)
+            .all()
+        )
+
+        return [
+            MessageDetail(
+                id=message.id,
+                sender_email=message.sender.email,
+                subject=message.subject,
+                content=message.content,
+                timestamp=message.timestamp,
+                recipients=[
+                    MessageRecipientInfo(
+                        email=recipient.recipient.email,
+                        read=recipient.read,
+                        read_at=recipient.read_at,
+                    )
+                    for recipient in message.recipients
+                ],
+            )
+            for message in messages
+        ]
+
+    def mark_message_as_read(self, message_id: UUID, recipient_email: str) -> None:
         """
         Mark a message as read for a specific recipient.
         Args:
-            message_id (str): The ID of the message to mark as read.
+            message_id (UUID): The ID of the message to mark as read.
             recipient_email (str): The email of the recipient marking the message as read.
         Raises:
             ValueError: If the message or recipient does not exist.
         """
-        recipient = (
-            self.db_session.query(User).filter(User.email == recipient_email).first()
+        # Flip the flag in one statement; only unread deliveries match.
+        recipient_id_subquery = (
+            select(User.id).where(User.email == recipient_email).scalar_subquery()
+        )
+        stmt = (
+            update(MessageRecipient)
+            .where(
+                MessageRecipient.message_id == message_id,
+                MessageRecipient.recipient_id == recipient_id_subquery,
+                MessageRecipient.read.is_(False),
+            )
+            .values(read=True, read_at=func.now())
+            .returning(MessageRecipient.id)
         )
-        if not recipient:
+        if self.db_session.execute(stmt).first():
+            self.db_session.commit()
+            return
+
+        # Nothing was updated: work out why for the error message.
+        recipient_id = self._resolve_user_id(recipient_email)
+        if not recipient_id:
             raise ValueError("Recipient does not exist.")
 
-        message_recipient = (
-            self.db_session.query(MessageRecipient)
+        # first(): a recipient listed twice has more than one delivery row.
+        delivery = (
+            self.db_session.query(MessageRecipient.read)
             .filter(
                 MessageRecipient.message_id == message_id,
-                MessageRecipient.recipient_id == recipient.id,
+                MessageRecipient.recipient_id == recipient_id,
             )
             .first()
         )
-
-        if not message_recipient:
+        if delivery is None:
             raise ValueError("Message does not exist for this recipient.")
 
-        if message_recipient.read:
-            raise ValueError("Message has already been marked as read.")
-
-        message_recipient.read = True
-        message_recipient.read_at = datetime.utcnow()
-
-        self.db_session.commit()
+        raise ValueError("Message has already been marked as read.")
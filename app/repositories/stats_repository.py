@@ -0,0 +1,56 @@
+from uuid import UUID
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import Message, MessageRecipient, User
+from app.schemas import SystemStats, UserStats
+
+
+class StatsRepository:
+    """
+    Repository class for system-wide aggregate queries.
+    """
+
+    def __init__(self, db_session: Session):
+        self.db_session = db_session
+
+    def system_stats(self) -> SystemStats:
+        """
+        Count users, messages and unread deliveries in the database.
+
+        Returns:
+            SystemStats: System-wide totals.
+        """
+        return SystemStats(
+            total_users=self.db_session.query(func.count(User.id)).scalar(),
+            total_messages=self.db_session.query(func.count(Message.id)).scalar(),
+            total_unread_messages=self.db_session.query(func.count(MessageRecipient.id))
+            .filter(MessageRecipient.read.is_(False))
+            .scalar(),
+        )
+
+    def user_stats(self, user_id: UUID) -> UserStats:
+        """
+        Count the messages sent, received and still unread for one user.
+
+        Args:
+            user_id (UUID): The ID of the user.
+
+        Returns:
+            UserStats: Per-user totals.
+        """
+        return UserStats(
+            messages_sent=self.db_session.query(func.count(Message.id))
+            .filter(Message.sender_id == user_id)
+            .scalar(),
+            messages_received=self.db_session.query(func.count(MessageRecipient.id))
+            .filter(MessageRecipient.recipient_id == user_id)
+            .scalar(),
+            unread_count=self.db_session.query(func.count(MessageRecipient.id))
+            .filter(
+                MessageRecipient.recipient_id == user_id,
+                MessageRecipient.read.is_(False),
+            )
+            .scalar(),
+        )
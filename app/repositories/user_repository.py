@@ -1,71 +1,114 @@
+import time
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
-import app
 from app.models import User
-from app.schemas import UserCreate, UserPublic
+from app.schemas import UserCreate, UserPublic, UserPublicListAdapter
+
+# Short-lived, process-wide cache so bursts of list requests share one query.
+USERS_CACHE_TTL_SECONDS = 5
+_users_cache: dict[str, tuple[float, list[UserPublic]]] = {}
+
+# Single-user lookups by id. Only create_user clears it, and only in this
+# process: edits made elsewhere (direct SQL, another worker) can be served
+# stale for up to USER_CACHE_TTL_SECONDS.
+USER_CACHE_TTL_SECONDS = 60
+_user_by_id_cache: dict[UUID, tuple[float, UserPublic]] = {}
+
+
+def clear_users_cache() -> None:
+    """Drop cached users; called whenever the users table changes."""
+    _users_cache.clear()
+    _user_by_id_cache.clear()
 
 
 class UserRepository:
     """
     Repository class for user-related database operations.
-    """
 
-    def __init__(self, db_session: Session):
-        self.db_session = db_session
+    The class holds no state; methods are static and take the session.
+    """
 
-    def create_user(self, user_data: UserCreate) -> UserPublic:
+    @staticmethod
+    def create_user(db_session: Session, user_data: UserCreate) -> UserPublic:
         """
         Create a new user and return as UserPublic schema.
 
         Args:
+            db_session (Session): The database session.
             user_data (UserCreate): The user data to create.
 
         Returns:
             UserPublic: The created user data.
         """
-        user = self.db_session.query(User).filter(User.email == user_data.email).first()
-        if user:
+        # Duplicate check, insert and created_at fetch in one round trip:
+        # on an email conflict nothing is inserted and no row comes back.
+        stmt = (
+            insert(User)
+            .values(**user_data.model_dump(exclude_unset=True))
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User.id, User.email, User.name, User.created_at)
+        )
+        row = db_session.execute(stmt).first()
+        if row is None:
             raise ValueError("User with this email already exists.")
+        db_session.commit()
+        clear_users_cache()
 
-        new_user = User(**user_data.model_dump())
-        self.db_session.add(new_user)
-        self.db_session.commit()
-        self.db_session.refresh(new_user)
-
-        return UserPublic(
-            id=new_user.id,
-            email=new_user.email,
-            name=new_user.name,
-            created_at=new_user.created_at,
-        )
+        return UserPublic.model_validate(row)
 
-    def get_users(self) -> list[UserPublic]:
+    @staticmethod
+    def get_users(db_session: Session) -> list[UserPublic]:
         """
         Retrieve all users and return as a list of UserPublic schemas.
+
+        Results are cached for USERS_CACHE_TTL_SECONDS.
+
+        Args:
+            db_session (Session): The database session.
+
+        Returns:
+            list[UserPublic]: All users.
         """
-        users = self.db_session.query(User).all()
-        return [
-            UserPublic(
-                id=user.id, email=user.email, name=user.name, created_at=user.created_at
-            )
-            for user in users
-        ]
-
-    def get_user_by_id(self, user_id: int) -> UserPublic | None:
+        cached = _users_cache.get("all")
+        if cached and cached[0] > time.monotonic():
+            return list(cached[1])
+
+        # Core rows validated straight into the schema; no ORM entities involved
+        rows = db_session.execute(
+            select(User.id, User.email, User.name, User.created_at)
+        ).all()
+        users = UserPublicListAdapter.validate_python(rows, from_attributes=True)
+        _users_cache["all"] = (time.monotonic() + USERS_CACHE_TTL_SECONDS, users)
+        return list(users)
+
+    @staticmethod
+    def get_user_by_id(db_session: Session, user_id: UUID) -> UserPublic | None:
         """
         Retrieve a user by ID and return as UserPublic schema.
 
+        Found users are cached for USER_CACHE_TTL_SECONDS; misses are not cached.
+
         Args:
-            user_id (int): The ID of the user to retrieve.
+            db_session (Session): The database session.
+            user_id (UUID): The ID of the user to retrieve.
 
         Returns:
             UserPublic | None: The user data if found, otherwise None.
         """
-        user = self.db_session.query(User).filter(User.id == user_id).first()
-        return (
-            UserPublic(
-                id=user.id, email=user.email, name=user.name, created_at=user.created_at
-            )
-            if user
-            else None
+        cached = _user_by_id_cache.get(user_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        user = db_session.query(User).filter(User.id == user_id).first()
+        if not user:
+            return None
+        user_public = UserPublic.model_validate(user)
+        _user_by_id_cache[user_id] = (
+            time.monotonic() + USER_CACHE_TTL_SECONDS,
+            user_public,
         )
+        return user_public
@@ -1,19 +1,42 @@
+from collections.abc import Iterable
+from datetime import datetime
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-import app
 from app.db import get_db
 from app.repositories.message_repository import MessageRepository
-from app.schemas import (InboxMessage, MessageCreate, MessageDetail,
-                         MessageRecipientInfo, SentMessage)
+from app.schemas import (InboxMessage, InboxMessageListAdapter, InboxPreview,
+                         InboxPreviewListAdapter, MessageCreate, MessageDetail,
+                         MessageRecipientInfo, SentMessage,
+                         SentMessageListAdapter)
 
 
 def get_message_repository(db: Session = Depends(get_db)) -> MessageRepository:
     return MessageRepository(db)
 
 
+def _json_response(body: bytes) -> Response:
+    """
+    Wrap pre-serialized JSON; FastAPI passes Response objects through without
+    re-validating them against the route's response_model.
+    """
+    return Response(body, media_type="application/json")
+
+
+def _ndjson_response(messages: Iterable[BaseModel]) -> StreamingResponse:
+    """
+    Stream messages as newline-delimited JSON, one object per line.
+    """
+    return StreamingResponse(
+        (message.model_dump_json() + "\n" for message in messages),
+        media_type="application/x-ndjson",
+    )
+
+
 router = APIRouter(prefix="/messages", tags=["Messages"])
 
 
@@ -55,12 +78,19 @@ def send_message(
     response_model=list[SentMessage],
 )
 def get_sent_messages(
-    sender_email: str, repo: MessageRepository = Depends(get_message_repository)
+    sender_email: str,
+    since: datetime | None = Query(
+        None, description="Only include messages sent at or after this time"
+    ),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum messages to return"),
+    repo: MessageRepository = Depends(get_message_repository),
 ) -> list[SentMessage]:
-    """Retrieve all sent messages for a given sender.
+    """Retrieve the most recent sent messages for a given sender.
 
     Args:
         sender_email (str): The email of the sender.
+        since (datetime | None): Only include messages sent at or after this time.
+        limit (int): Maximum number of messages to return, newest first.
         repo (MessageRepository): The message repository dependency.
 
     Returns:
@@ -71,9 +101,45 @@ def get_sent_messages(
 
     """
     try:
-        return repo.get_sent_messages(sender_email)
+        messages = repo.get_sent_messages(sender_email, since, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return _json_response(SentMessageListAdapter.dump_json(messages))
+
+
+@router.get(
+    "/sent/{sender_email}/stream",
+    summary="Stream sent messages",
+    status_code=status.HTTP_200_OK,
+    operation_id="stream_sent_messages",
+    response_class=StreamingResponse,
+)
+def stream_sent_messages(
+    sender_email: str,
+    since: datetime | None = Query(
+        None, description="Only include messages sent at or after this time"
+    ),
+    repo: MessageRepository = Depends(get_message_repository),
+) -> StreamingResponse:
+    """Stream every sent message for a given sender as NDJSON, newest first.
+
+    Args:
+        sender_email (str): The email of the sender.
+        since (datetime | None): Only include messages sent at or after this time.
+        repo (MessageRepository): The message repository dependency.
+
+    Returns:
+        StreamingResponse: One SentMessage JSON object per line.
+
+    Raises:
+        HTTPException: If the sender does not exist.
+
+    """
+    try:
+        messages = repo.stream_sent_messages(sender_email, since)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return _ndjson_response(messages)
 
 
 @router.get(
@@ -84,12 +150,19 @@ def get_sent_messages(
     response_model=list[InboxMessage],
 )
 def get_inbox_messages(
-    recipient_email: str, repo: MessageRepository = Depends(get_message_repository)
+    recipient_email: str,
+    since: datetime | None = Query(
+        None, description="Only include messages sent at or after this time"
+    ),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum messages to return"),
+    repo: MessageRepository = Depends(get_message_repository),
 ) -> list[InboxMessage]:
-    """Retrieve all inbox messages for a given recipient.
+    """Retrieve the most recent inbox messages for a given recipient.
 
     Args:
         recipient_email (str): The email of the recipient.
+        since (datetime | None): Only include messages sent at or after this time.
+        limit (int): Maximum number of messages to return, newest first.
         repo (MessageRepository): The message repository dependency.
 
     Returns:
@@ -100,38 +173,82 @@ def get_inbox_messages(
 
     """
     try:
-        return repo.get_inbox_messages(recipient_email)
+        messages = repo.get_inbox_messages(recipient_email, since, limit)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return _json_response(InboxMessageListAdapter.dump_json(messages))
 
 
 @router.get(
-    "/{message_id}",
-    summary="Get message details",
+    "/inbox/{recipient_email}/stream",
+    summary="Stream inbox messages",
     status_code=status.HTTP_200_OK,
-    operation_id="get_message_detail",
-    response_model=MessageDetail,
+    operation_id="stream_inbox_messages",
+    response_class=StreamingResponse,
 )
-def get_message_detail(
-    message_id: UUID, repo: MessageRepository = Depends(get_message_repository)
-) -> MessageDetail:
-    """Retrieve detailed information about a specific message.
+def stream_inbox_messages(
+    recipient_email: str,
+    since: datetime | None = Query(
+        None, description="Only include messages sent at or after this time"
+    ),
+    repo: MessageRepository = Depends(get_message_repository),
+) -> StreamingResponse:
+    """Stream every inbox message for a given recipient as NDJSON, newest first.
 
     Args:
-        message_id (str): The unique identifier of the message.
+        recipient_email (str): The email of the recipient.
+        since (datetime | None): Only include messages sent at or after this time.
         repo (MessageRepository): The message repository dependency.
 
     Returns:
-        MessageDetail: Detailed information about the message.
+        StreamingResponse: One InboxMessage JSON object per line.
 
     Raises:
-        HTTPException: If the message does not exist.
+        HTTPException: If the recipient does not exist.
 
     """
     try:
-        return repo.get_message_detail(message_id)
+        messages = repo.stream_inbox_messages(recipient_email, since)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return _ndjson_response(messages)
+
+
+@router.get(
+    "/inbox/{recipient_email}/previews",
+    summary="Get inbox previews",
+    status_code=status.HTTP_200_OK,
+    operation_id="get_inbox_previews",
+    response_model=list[InboxPreview],
+)
+def get_inbox_previews(
+    recipient_email: str,
+    since: datetime | None = Query(
+        None, description="Only include messages sent at or after this time"
+    ),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum messages to return"),
+    repo: MessageRepository = Depends(get_message_repository),
+) -> list[InboxPreview]:
+    """Retrieve inbox previews (without message content) for a given recipient.
+
+    Args:
+        recipient_email (str): The email of the recipient.
+        since (datetime | None): Only include messages sent at or after this time.
+        limit (int): Maximum number of previews to return, newest first.
+        repo (MessageRepository): The message repository dependency.
+
+    Returns:
+        list[InboxPreview]: A list of inbox previews.
+
+    Raises:
+        HTTPException: If the recipient does not exist.
+
+    """
+    try:
+        previews = repo.list_inbox_previews(recipient_email, since, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return _json_response(InboxPreviewListAdapter.dump_json(previews))
 
 
 @router.get(
@@ -158,7 +275,38 @@ def get_unread_messages(
 
     """
     try:
-        return repo.get_unread_messages(recipient_email)
+        messages = repo.get_unread_messages(recipient_email)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return _json_response(InboxMessageListAdapter.dump_json(messages))
+
+
+# Keep the catch-all message id route after the literal-prefix routes above.
+@router.get(
+    "/{message_id}",
+    summary="Get message details",
+    status_code=status.HTTP_200_OK,
+    operation_id="get_message_detail",
+    response_model=MessageDetail,
+)
+def get_message_detail(
+    message_id: UUID, repo: MessageRepository = Depends(get_message_repository)
+) -> MessageDetail:
+    """Retrieve detailed information about a specific message.
+
+    Args:
+        message_id (str): The unique identifier of the message.
+        repo (MessageRepository): The message repository dependency.
+
+    Returns:
+        MessageDetail: Detailed information about the message.
+
+    Raises:
+        HTTPException: If the message does not exist.
+
+    """
+    try:
+        return repo.get_message_detail(message_id)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
@@ -1,17 +1,11 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
-import app
 from app.db import get_db
 from app.repositories.user_repository import UserRepository
-from app.schemas import UserCreate, UserPublic
-
-
-def get_user_repository(db: Session = Depends(get_db)) -> UserRepository:
-    return UserRepository(db)
-
+from app.schemas import UserCreate, UserPublic, UserPublicListAdapter
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -23,15 +17,13 @@ router = APIRouter(prefix="/users", tags=["Users"])
     operation_id="create_user",
     response_model=UserPublic,
 )
-def create_user(
-    user: UserCreate, repo: UserRepository = Depends(get_user_repository)
-) -> UserPublic:
+def create_user(user: UserCreate, db: Session = Depends(get_db)) -> UserPublic:
     """
     Create a new user in the system.
 
     Args:
         user (UserCreate): The user data to create.
-        repo (UserRepository): The user repository dependency.
+        db (Session): The database session dependency.
 
     Returns:
         UserPublic: The created user data.
@@ -40,7 +32,7 @@ def create_user(
         HTTPException: If the user already exists or if there is a validation error.
     """
     try:
-        user_public = repo.create_user(user)
+        user_public = UserRepository.create_user(db, user)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -56,24 +48,29 @@ def create_user(
 )
 def get_users(
     id: UUID | None = Query(None, description="Filter users by ID"),
-    repo: UserRepository = Depends(get_user_repository),
+    db: Session = Depends(get_db),
 ) -> list[UserPublic] | UserPublic:
     """
     Retrieve all users or filter by ID.
 
     Args:
         id (int | None): Optional user ID to filter by.
-        repo (UserRepository): The user repository dependency.
+        db (Session): The database session dependency.
 
     Returns:
         list[UserPublic]: A list of user data.
     """
     if id is not None:
-        user = repo.get_user_by_id(id)
+        user = UserRepository.get_user_by_id(db, id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
             )
         return user
 
-    return repo.get_users()
+    # Already validated by the repository; serialize once and skip the
+    # response_model round trip.
+    return Response(
+        UserPublicListAdapter.dump_json(UserRepository.get_users(db)),
+        media_type="application/json",
+    )
@@ -1,33 +1,34 @@
 # Pydantic models
+import re
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field, ValidationError, field_validator
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, TypeAdapter
+
+# One '@', non-empty local part, and a dot somewhere in the domain
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+def _normalize_email(value: str) -> str:
+    """
+    Strip and lowercase an email, raising ValueError if the format is invalid.
+    """
+    email = value.strip().lower()
+    if not _EMAIL_RE.match(email):
+        raise ValueError(f"Invalid email format: {value}")
+    return email
+
+
+# Email string that is stripped, lowercased and format-checked on input
+NormalizedEmail = Annotated[str, AfterValidator(_normalize_email)]
 
 
 class UserCreate(BaseModel):
-    email: str = Field(..., description="User's unique email address")
+    email: NormalizedEmail = Field(..., description="User's unique email address")
     name: str = Field(..., min_length=1, max_length=100, description="User's name")
 
-    @field_validator("email")
-    def validate_email(cls, value: str) -> str:
-        """
-        Validate that the email has a basic correct format.
-        Converts the email to lowercase and strips whitespace.
-        """
-        value = value.strip().lower()
-        if "@" not in value or "." not in value.split("@")[-1]:
-            raise ValidationError("Invalid email format")
-        if value.count("@") != 1:
-            raise ValidationError("Email must contain exactly one '@' symbol")
-        local, domain = value.split("@")
-        if not local or not domain or "." not in domain:
-            raise ValidationError("Invalid email format")
-        return value
-
-    class ConfigDict:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UserPublic(BaseModel):
@@ -36,57 +37,18 @@ class UserPublic(BaseModel):
     name: str = Field(..., min_length=1, max_length=100, description="User's name")
     created_at: datetime = Field(..., description="Timestamp when the user was created")
 
-    class ConfigDict:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class MessageCreate(BaseModel):
-    sender_email: str = Field(..., description="Sender's email address")
-    recipient_emails: list[str] = Field(..., description="List of recipient emails")
+    sender_email: NormalizedEmail = Field(..., description="Sender's email address")
+    recipient_emails: list[NormalizedEmail] = Field(
+        ..., min_length=1, description="List of recipient emails"
+    )
     subject: Optional[str] = Field(None, max_length=255)
     content: str = Field(..., min_length=1)
 
-    @field_validator("sender_email")
-    def validate_sender_email(cls, value: str) -> str:
-        """
-        Validate that the sender's email has a basic correct format.
-        Converts the email to lowercase and strips whitespace.
-        """
-        value = value.strip().lower()
-        if "@" not in value or "." not in value.split("@")[-1]:
-            raise ValidationError("Invalid sender email format")
-        if value.count("@") != 1:
-            raise ValidationError("Sender email must contain exactly one '@' symbol")
-        local, domain = value.split("@")
-        if not local or not domain or "." not in domain:
-            raise ValidationError("Invalid sender email format")
-        return value
-
-    @field_validator("recipient_emails")
-    def validate_recipient_emails(cls, value: list[str]) -> list[str]:
-        """
-        Validate that all recipient emails have a basic correct format.
-        Converts the emails to lowercase and strips whitespace.
-        """
-        if not value:
-            raise ValidationError("At least one recipient email is required")
-
-        for email in value:
-            email = email.strip().lower()
-            if "@" not in email or "." not in email.split("@")[-1]:
-                raise ValidationError(f"Invalid recipient email format: {email}")
-            if email.count("@") != 1:
-                raise ValidationError(
-                    f"Recipient email must contain exactly one '@' symbol: {email}"
-                )
-            local, domain = email.split("@")
-            if not local or not domain or "." not in domain:
-                raise ValidationError(f"Invalid recipient email format: {email}")
-
-        return value
-
-    class ConfigDict:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class SentMessage(BaseModel):
@@ -104,8 +66,7 @@ class SentMessage(BaseModel):
     )
     timestamp: datetime = Field(..., description="Time when the message was sent")
 
-    class ConfigDict:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class InboxMessage(BaseModel):
@@ -121,8 +82,17 @@ class InboxMessage(BaseModel):
         None, description="Timestamp when the message was read"
     )
 
-    class ConfigDict:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class InboxPreview(BaseModel):
+    id: UUID = Field(..., description="Unique identifier for the message")
+    sender_email: str = Field(..., description="Sender's email address", max_length=254)
+    subject: Optional[str] = Field(None, description="Message subject", max_length=255)
+    timestamp: datetime = Field(..., description="Time when the message was received")
+    read: bool = Field(False, description="Read status of the message")
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 class MessageRecipientInfo(BaseModel):
@@ -132,8 +102,7 @@ class MessageRecipientInfo(BaseModel):
         None, description="Timestamp when this recipient read the message"
     )
 
-    class ConfigDict:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class MessageDetail(BaseModel):
@@ -148,5 +117,31 @@ class MessageDetail(BaseModel):
         default_factory=list, description="List of recipients with read status"
     )
 
-    class ConfigDict:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SystemStats(BaseModel):
+    total_users: int = Field(..., description="Number of registered users")
+    total_messages: int = Field(..., description="Number of messages sent")
+    total_unread_messages: int = Field(
+        ..., description="Number of message deliveries not yet read"
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UserStats(BaseModel):
+    messages_sent: int = Field(..., description="Number of messages sent by the user")
+    messages_received: int = Field(
+        ..., description="Number of messages received by the user"
+    )
+    unread_count: int = Field(..., description="Number of received messages not read")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Whole-list adapters: validate or serialize a batch in one pydantic-core call
+UserPublicListAdapter = TypeAdapter(list[UserPublic])
+SentMessageListAdapter = TypeAdapter(list[SentMessage])
+InboxMessageListAdapter = TypeAdapter(list[InboxMessage])
+InboxPreviewListAdapter = TypeAdapter(list[InboxPreview])
@@ -3,6 +3,7 @@ from urllib.parse import urlparse
 
 import psycopg2
 from dotenv import load_dotenv
+from psycopg2 import sql
 
 
 def create_database_if_not_exists():
@@ -23,11 +24,11 @@ def create_database_if_not_exists():
         conn.autocommit = True
         cur = conn.cursor()
 
-        cur.execute(f"SELECT 1 FROM pg_database WHERE datname = '{db_name}'")
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (db_name,))
         exists = cur.fetchone()
 
         if not exists:
-            cur.execute(f"CREATE DATABASE {db_name}")
+            cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(db_name)))
             print(f"Database '{db_name}' created successfully.")
         else:
             print(f"Database '{db_name}' already exists.")
@@ -1,67 +1,387 @@
+import hashlib
 import os
+from contextlib import contextmanager
 from urllib.parse import urlparse
 
+import httpx
 import psycopg2
 import pytest
 from fastapi.testclient import TestClient
+from psycopg2 import sql
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
+from sqlalchemy.schema import CreateIndex, CreateTable
 
 from app.db import Base, get_db
 from app.main import app
+from app.repositories.user_repository import clear_users_cache
 
-TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+BASE_TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
 
 
-def create_database_if_not_exists(database_url):
-    url = urlparse(database_url)
-    db_name = url.path[1:]
-    admin_url = database_url.replace(f"/{db_name}", "/postgres")
+def worker_database_url(database_url):
+    """
+    Give each pytest-xdist worker its own database, e.g. test_api_gw0.
+    """
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if not worker:
+        return database_url
+    path = urlparse(database_url).path
+    return database_url.replace(path, f"{path}_{worker}")
 
-    conn = psycopg2.connect(admin_url)
-    conn.autocommit = True
-    cur = conn.cursor()
-    cur.execute(f"SELECT 1 FROM pg_database WHERE datname = '{db_name}'")
-    exists = cur.fetchone()
-    if not exists:
-        cur.execute(f"CREATE DATABASE {db_name}")
 
+TEST_DATABASE_URL = worker_database_url(BASE_TEST_DATABASE_URL)
+# Shared by all workers; each one clones its own database from it
+TEMPLATE_DATABASE_NAME = f"{urlparse(BASE_TEST_DATABASE_URL).path[1:]}_tmpl"
 
-create_database_if_not_exists(TEST_DATABASE_URL)
+# Autocommit connection to the "postgres" database, reused for all admin DDL
+_ADMIN_CONN = None
 
-engine = create_engine(TEST_DATABASE_URL)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def get_admin_connection(database_url):
+    """
+    Return the cached admin connection, opening it on first use.
+    """
+    global _ADMIN_CONN
+    if _ADMIN_CONN is None or _ADMIN_CONN.closed:
+        url = urlparse(database_url)
+        admin_url = database_url.replace(url.path, "/postgres")
+        connect_kwargs = {"connect_timeout": 3}
+        if url.hostname in ("localhost", "127.0.0.1", "::1"):
+            # Nothing to protect on loopback; skip the TLS negotiation
+            connect_kwargs["sslmode"] = "disable"
+        _ADMIN_CONN = psycopg2.connect(admin_url, **connect_kwargs)
+        _ADMIN_CONN.autocommit = True
+    return _ADMIN_CONN
 
-@pytest.fixture(scope="session", autouse=True)
+
+def close_admin_connection():
+    global _ADMIN_CONN
+    if _ADMIN_CONN is not None:
+        _ADMIN_CONN.close()
+        _ADMIN_CONN = None
+
+
+def schema_checksum():
+    """Hash of the DDL for every table and index, used to spot a stale template."""
+    dialect = postgresql.dialect()
+    ddl = []
+    for table in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            ddl.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return hashlib.sha256("\n".join(ddl).encode()).hexdigest()
+
+
+def ensure_template_database(admin_cur, database_url, template_name):
+    """
+    Build the schema into a template database, once per schema version.
+
+    The checksum is stored as the template's database comment; when it still
+    matches the models, the existing template is reused as is.
+    """
+    checksum = schema_checksum()
+    admin_cur.execute(
+        "SELECT shobj_description(oid, 'pg_database') FROM pg_database "
+        "WHERE datname = %s",
+        (template_name,),
+    )
+    row = admin_cur.fetchone()
+    if row and row[0] == checksum:
+        return
+
+    template = sql.Identifier(template_name)
+    admin_cur.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(template))
+    admin_cur.execute(sql.SQL("CREATE DATABASE {}").format(template))
+    template_engine = create_engine(
+        database_url.replace(urlparse(database_url).path, f"/{template_name}")
+    )
+    Base.metadata.create_all(bind=template_engine)
+    template_engine.dispose()
+    admin_cur.execute(
+        sql.SQL("COMMENT ON DATABASE {} IS {}").format(template, sql.Literal(checksum))
+    )
+
+
+def create_database_from_template(database_url, template_name):
+    """
+    (Re)create the test database as a copy of the schema template.
+    """
+    db_name = urlparse(database_url).path[1:]
+
+    with get_admin_connection(database_url).cursor() as cur:
+        # xdist workers start together; only one may (re)build the template,
+        # and nobody may clone it halfway through.
+        cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (template_name,))
+        try:
+            ensure_template_database(cur, database_url, template_name)
+            cur.execute(
+                sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(
+                    sql.Identifier(db_name)
+                )
+            )
+            cur.execute(
+                sql.SQL("CREATE DATABASE {} TEMPLATE {}").format(
+                    sql.Identifier(db_name), sql.Identifier(template_name)
+                )
+            )
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (template_name,))
+
+
+# Durability settings that only cost time on a throwaway test cluster. All of
+# them take effect on a config reload, no restart needed. They apply to the
+# whole server, so they are opt-in: only set TEST_NON_DURABLE_SERVER=1 where
+# the server holds nothing but test data (CI). Otherwise each test connection
+# still gets synchronous_commit=off on its own.
+NON_DURABLE_SERVER = os.getenv("TEST_NON_DURABLE_SERVER") == "1"
+_SERVER_SETTINGS_CHANGED = False
+NON_DURABLE_SETTINGS = {
+    "synchronous_commit": "off",
+    "fsync": "off",
+    "full_page_writes": "off",
+}
+
+
+def set_non_durable_settings(database_url):
+    """
+    Turn off fsync and friends on the server via ALTER SYSTEM.
+
+    Requires a superuser; otherwise the settings are left alone.
+
+    Returns:
+        bool: Whether the settings were changed.
+    """
+    with get_admin_connection(database_url).cursor() as cur:
+        cur.execute("SELECT current_setting('is_superuser') = 'on'")
+        if not cur.fetchone()[0]:
+            return False
+        for name, value in NON_DURABLE_SETTINGS.items():
+            cur.execute(
+                sql.SQL("ALTER SYSTEM SET {} = {}").format(
+                    sql.Identifier(name), sql.Literal(value)
+                )
+            )
+        cur.execute("SELECT pg_reload_conf()")
+    return True
+
+
+def reset_non_durable_settings(database_url):
+    # Only reset what we set, leaving any other ALTER SYSTEM changes in place
+    with get_admin_connection(database_url).cursor() as cur:
+        for name in NON_DURABLE_SETTINGS:
+            cur.execute(sql.SQL("ALTER SYSTEM RESET {}").format(sql.Identifier(name)))
+        cur.execute("SELECT pg_reload_conf()")
+
+
+def drop_database(database_url):
+    db_name = urlparse(database_url).path[1:]
+
+    with get_admin_connection(database_url).cursor() as cur:
+        cur.execute(
+            sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(
+                sql.Identifier(db_name)
+            )
+        )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "postgres: Postgres variant of a test that defaults to SQLite"
+    )
+    # Once, in the main process: under xdist the controller outlives all the
+    # workers, so no worker can reset the settings while others still run.
+    global _SERVER_SETTINGS_CHANGED
+    if NON_DURABLE_SERVER and not hasattr(config, "workerinput"):
+        _SERVER_SETTINGS_CHANGED = set_non_durable_settings(BASE_TEST_DATABASE_URL)
+
+
+def pytest_unconfigure(config):
+    if _SERVER_SETTINGS_CHANGED:
+        reset_non_durable_settings(BASE_TEST_DATABASE_URL)
+        close_admin_connection()
+
+
+def pytest_collection_modifyitems(config, items):
+    # Unless -m asks about postgres, the SQLite variant is enough for
+    # dual-backend tests
+    if "postgres" in config.option.markexpr:
+        return
+    selected, deselected = [], []
+    for item in items:
+        if item.get_closest_marker("postgres"):
+            deselected.append(item)
+        else:
+            selected.append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+
+# No pooling: connections are never handed back with a half-finished
+# transaction, and nothing lingers when a worker exits. The test database is
+# thrown away, so skip waiting for WAL flushes on COMMIT.
+engine = create_engine(
+    TEST_DATABASE_URL,
+    poolclass=NullPool,
+    connect_args={"options": "-c synchronous_commit=off"},
+)
+# Objects stay loaded after commit(); the app reads them back without a
+# re-SELECT, and the rows are rolled back at the end of the test anyway.
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
+
+
+@pytest.fixture(scope="session")
 def setup_test_db():
-    # Create the database tables
-    Base.metadata.create_all(bind=engine)
+    # Clone the schema from the template instead of running CREATE TABLEs.
+    # Not autouse: db_connection pulls it in, so SQLite-only runs skip Postgres.
+    create_database_from_template(TEST_DATABASE_URL, TEMPLATE_DATABASE_NAME)
     yield
 
-    # Teardown: drop the database tables
-    Base.metadata.drop_all(bind=engine)
+    # Teardown: release pooled connections, then drop the copy
+    engine.dispose()
+    drop_database(TEST_DATABASE_URL)
+    close_admin_connection()
+
+
+@pytest.fixture(scope="session")
+def client():
+    # One client for the whole run, so the app lifespan starts up once
+    with TestClient(app) as c:
+        yield c
 
 
-@pytest.fixture
-def db_session():
+@pytest.fixture(scope="session")
+def anyio_backend():
+    # Session-scoped so that the session-scoped async client can share one loop
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def aclient(anyio_backend):
+    # Calls the app in-process on the test event loop, with no per-request
+    # portal round-trip like TestClient makes
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def db_connection(setup_test_db):
+    # One connection and outer transaction for the whole run; nothing commits
     connection = engine.connect()
     transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+    yield connection
+
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="module")
+def module_db_session(db_connection):
+    # Module-level SAVEPOINT for data shared by every test in a module; the
+    # per-test savepoints nest inside it.
+    savepoint = db_connection.begin_nested()
+    session = TestingSessionLocal(
+        bind=db_connection, join_transaction_mode="create_savepoint"
+    )
+    try:
+        yield session
+    finally:
+        session.close()
+        savepoint.rollback()
+
+
+# Session of the running test, read by the get_db override. A plain global
+# rather than a ContextVar: async tests run in the anyio runner's context, which
+# never sees values set by sync fixtures. Tests run one at a time per process.
+_CURRENT_DB_SESSION = None
+
+
+@contextmanager
+def postgres_session(db_connection):
+    # Each test runs inside its own SAVEPOINT. The session's commit() calls
+    # only release inner savepoints, so rolling this one back undoes the test.
+    savepoint = db_connection.begin_nested()
+    session = TestingSessionLocal(
+        bind=db_connection, join_transaction_mode="create_savepoint"
+    )
     try:
         yield session
     finally:
         session.close()
-        transaction.rollback()
-        connection.close()
+        savepoint.rollback()
+
+
+@contextmanager
+def sqlite_session():
+    # A fresh in-memory database per test; creating the schema is near free.
+    # create_user's postgresql ON CONFLICT insert compiles for SQLite as is.
+    # StaticPool keeps the single connection (and so the data) alive, and the
+    # app's threadpool needs it usable from other threads.
+    sqlite_engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=sqlite_engine)
+    session = TestingSessionLocal(bind=sqlite_engine)
+    try:
+        yield session
+    finally:
+        session.close()
+        sqlite_engine.dispose()
+
+
+@pytest.fixture(params=[pytest.param("postgres", marks=pytest.mark.postgres), "sqlite"])
+def db_backend(request):
+    # Opt in with usefixtures("db_backend") for tests that need nothing
+    # Postgres-specific. The postgres variant only runs with `-m postgres`.
+    return request.param
 
 
 @pytest.fixture(autouse=True)
-def override_get_db(db_session):
-    def _get_db():
+def db_session(request):
+    backend = "postgres"
+    if "db_backend" in request.fixturenames:
+        backend = request.getfixturevalue("db_backend")
+    if backend == "sqlite":
+        sessions = sqlite_session()
+    else:
+        # Resolved here so the SQLite variant never connects to Postgres; the
+        # module savepoint must exist before the per-test one nests in it.
+        request.getfixturevalue("module_db_session")
+        sessions = postgres_session(request.getfixturevalue("db_connection"))
+
+    global _CURRENT_DB_SESSION
+    with sessions as session:
+        _CURRENT_DB_SESSION = session
         try:
-            yield db_session
+            yield session
         finally:
-            pass
+            _CURRENT_DB_SESSION = None
+
+
+@pytest.fixture(scope="session", autouse=True)
+def override_get_db():
+    # Installed once; each request picks up the current test's session
+    def _get_db():
+        yield _CURRENT_DB_SESSION
 
     app.dependency_overrides[get_db] = _get_db
+    try:
+        yield
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture(autouse=True)
+def reset_users_cache():
+    # Cached lists may hold rows from a rolled-back test transaction
+    clear_users_cache()
+    yield
+    clear_users_cache()
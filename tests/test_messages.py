@@ -1,38 +1,63 @@
+import json
+from datetime import timedelta
+from uuid import UUID, uuid4
+
 import pytest
-from fastapi.testclient import TestClient
+from sqlalchemy import select, update
 
-from app.main import app
+from app.models import Message, MessageRecipient, User
+from app.repositories.message_repository import MessageRepository
+from app.schemas import MessageCreate
 
-client = TestClient(app)
+# Async tests share one in-process client on the session event loop
+pytestmark = pytest.mark.anyio
 
 
-@pytest.fixture
-def users():
-    sender = {"email": "sender@example.com", "name": "Sender"}
-    recipient1 = {"email": "recipient1@example.com", "name": "Recipient One"}
-    recipient2 = {"email": "recipient2@example.com", "name": "Recipient Two"}
-    client.post("/users/", json=sender)
-    client.post("/users/", json=recipient1)
-    client.post("/users/", json=recipient2)
+@pytest.fixture(scope="module")
+def users(module_db_session):
+    # Created once per module; unique emails keep modules from colliding
+    suffix = uuid4().hex[:8]
+    sender = {"email": f"sender-{suffix}@example.com", "name": "Sender"}
+    recipient1 = {"email": f"recipient1-{suffix}@example.com", "name": "Recipient One"}
+    recipient2 = {"email": f"recipient2-{suffix}@example.com", "name": "Recipient Two"}
+    # Plain ORM inserts: setup data doesn't need to go through the API
+    module_db_session.add_all(
+        [User(**user) for user in (sender, recipient1, recipient2)]
+    )
+    module_db_session.flush()
     return sender, recipient1, recipient2
 
 
-@pytest.fixture
-def sample_message(users):
+@pytest.fixture(scope="module")
+def sample_message(module_db_session, users):
+    # Sent once per module through the repository; tests that mark it read
+    # are rolled back by their own savepoint.
     sender, recipient1, recipient2 = users
-    payload = {
-        "sender_email": sender["email"],
-        "recipient_emails": [recipient1["email"], recipient2["email"]],
-        "subject": "Sample Subject",
-        "content": "Sample message content.",
-    }
-    resp = client.post("/messages/", json=payload)
-    assert resp.status_code == 201
-    message_id = resp.json()["id"]
-    return message_id, users
+    message = MessageRepository(module_db_session).send_message(
+        MessageCreate(
+            sender_email=sender["email"],
+            recipient_emails=[recipient1["email"], recipient2["email"]],
+            subject="Sample Subject",
+            content="Sample message content.",
+        )
+    )
+    return str(message.id), users
 
 
-def test_send_message(users):
+def assert_message_read(db_session, message_id, recipient_email):
+    """Check the recipient row directly instead of fetching the whole inbox."""
+    read = db_session.execute(
+        select(MessageRecipient.read)
+        .join(User, User.id == MessageRecipient.recipient_id)
+        .where(
+            MessageRecipient.message_id == UUID(message_id),
+            User.email == recipient_email,
+        )
+    ).scalar_one()
+    assert read is True
+
+
+async def test_send_message(aclient, users):
     sender, recipient1, recipient2 = users
     payload = {
         "sender_email": sender["email"],
@@ -40,7 +65,7 @@ def test_send_message(users):
         "subject": "Test Subject",
         "content": "Hello, this is a test message.",
     }
-    response = client.post("/messages/", json=payload)
+    response = await aclient.post("/messages/", json=payload)
     assert response.status_code == 201
     data = response.json()
     assert data["sender_email"] == sender["email"]
@@ -51,67 +76,185 @@ def test_send_message(users):
     assert "id" in data
 
 
-def test_get_inbox(sample_message):
+async def test_send_message_unknown_recipient(aclient, users):
+    sender, recipient1, recipient2 = users
+    payload = {
+        "sender_email": sender["email"],
+        "recipient_emails": [
+            recipient1["email"],
+            "nobody@example.com",
+            "ghost@example.com",
+        ],
+        "subject": "Test Subject",
+        "content": "Hello, this is a test message.",
+    }
+    sent_resp = await aclient.get(f"/messages/sent/{sender['email']}")
+    sent_before = sent_resp.json()
+    response = await aclient.post("/messages/", json=payload)
+    assert response.status_code == 400
+    assert response.json()["detail"] == (
+        "Recipients do not exist: nobody@example.com, ghost@example.com."
+    )
+
+    # Nothing is persisted when a recipient cannot be resolved
+    sent_resp = await aclient.get(f"/messages/sent/{sender['email']}")
+    assert sent_resp.status_code == 200
+    assert sent_resp.json() == sent_before
+
+
+async def test_get_inbox(aclient, sample_message):
     message_id, (sender, recipient1, recipient2) = sample_message
-    response = client.get(f"/messages/inbox/{recipient1['email']}")
+    response = await aclient.get(f"/messages/inbox/{recipient1['email']}")
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
-    assert any(msg["id"] == message_id for msg in data)
+    by_id = {msg["id"]: msg for msg in data}
+    assert message_id in by_id
+
+
+async def test_get_inbox_previews(aclient, sample_message):
+    message_id, (sender, recipient1, recipient2) = sample_message
+    response = await aclient.get(f"/messages/inbox/{recipient1['email']}/previews")
+    assert response.status_code == 200
+    by_id = {msg["id"]: msg for msg in response.json()}
+    preview = by_id[message_id]
+    assert preview["sender_email"] == sender["email"]
+    assert preview["read"] is False
+    assert "content" not in preview
 
 
-def test_get_sent(sample_message):
+async def test_get_sent(aclient, sample_message):
     message_id, (sender, recipient1, recipient2) = sample_message
-    response = client.get(f"/messages/sent/{sender['email']}")
+    response = await aclient.get(f"/messages/sent/{sender['email']}")
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
-    assert any(msg["id"] == message_id for msg in data)
+    by_id = {msg["id"]: msg for msg in data}
+    assert message_id in by_id
+
+
+async def test_stream_sent(aclient, sample_message):
+    message_id, (sender, recipient1, recipient2) = sample_message
+    response = await aclient.get(f"/messages/sent/{sender['email']}/stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    data = [json.loads(line) for line in response.text.splitlines()]
+    assert [msg["id"] for msg in data] == [message_id]
+    assert sorted(data[0]["recipient_emails"]) == sorted(
+        [recipient1["email"], recipient2["email"]]
+    )
 
 
-def test_mark_message_as_read(sample_message):
+async def test_stream_inbox(aclient, sample_message):
     message_id, (sender, recipient1, recipient2) = sample_message
-    patch_resp = client.patch(
+    response = await aclient.get(f"/messages/inbox/{recipient1['email']}/stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    data = [json.loads(line) for line in response.text.splitlines()]
+    assert [msg["id"] for msg in data] == [message_id]
+    assert data[0]["sender_email"] == sender["email"]
+    assert data[0]["content"] == "Sample message content."
+    assert data[0]["read"] is False
+
+
+async def test_get_sent_limit(aclient, db_session, sample_message):
+    message_id, (sender, recipient1, recipient2) = sample_message
+    # Everything here shares the run's transaction and so its now(); backdate
+    # the sample message so the one sent below is strictly newer.
+    db_session.execute(
+        update(Message)
+        .where(Message.id == UUID(message_id))
+        .values(timestamp=Message.timestamp - timedelta(minutes=1))
+    )
+    db_session.flush()
+    payload = {
+        "sender_email": sender["email"],
+        "recipient_emails": [recipient1["email"]],
+        "subject": "Newer Subject",
+        "content": "A newer message.",
+    }
+    newer_resp = await aclient.post("/messages/", json=payload)
+    newer_id = newer_resp.json()["id"]
+
+    response = await aclient.get(
+        f"/messages/sent/{sender['email']}", params={"limit": 1}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["id"] == newer_id
+
+
+async def test_mark_message_as_read(aclient, db_session, sample_message):
+    message_id, (sender, recipient1, recipient2) = sample_message
+    patch_resp = await aclient.patch(
         f"/messages/read/{message_id}", params={"recipient_email": recipient1["email"]}
     )
     assert patch_resp.status_code == 200
     assert patch_resp.json()["detail"] == "Message marked as read successfully"
 
-    # Check that the message is now marked as read in inbox
-    inbox_resp = client.get(f"/messages/inbox/{recipient1['email']}")
-    assert inbox_resp.status_code == 200
-    inbox = inbox_resp.json()
-    msg = next((m for m in inbox if m["id"] == message_id), None)
-    assert msg is not None
-    assert msg["read"] is True
+    assert_message_read(db_session, message_id, recipient1["email"])
+
+
+async def test_mark_message_as_read_twice(aclient, db_session, sample_message):
+    message_id, (sender, recipient1, recipient2) = sample_message
+    params = {"recipient_email": recipient1["email"]}
+    first = await aclient.patch(f"/messages/read/{message_id}", params=params)
+    assert first.status_code == 200
+    assert_message_read(db_session, message_id, recipient1["email"])
+
+    response = await aclient.patch(f"/messages/read/{message_id}", params=params)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Message has already been marked as read."
+
+
+async def test_mark_message_as_read_duplicate_recipient(aclient, users):
+    sender, recipient1, recipient2 = users
+    payload = {
+        "sender_email": sender["email"],
+        "recipient_emails": [recipient1["email"], recipient1["email"]],
+        "subject": "Twice",
+        "content": "Same recipient listed twice.",
+    }
+    send_resp = await aclient.post("/messages/", json=payload)
+    assert send_resp.status_code == 201
+    message_id = send_resp.json()["id"]
+
+    params = {"recipient_email": recipient1["email"]}
+    first = await aclient.patch(f"/messages/read/{message_id}", params=params)
+    assert first.status_code == 200
+
+    response = await aclient.patch(f"/messages/read/{message_id}", params=params)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Message has already been marked as read."
 
 
-def test_get_unread_messages(sample_message):
+async def test_get_unread_messages(aclient, sample_message):
     message_id, (sender, recipient1, recipient2) = sample_message
 
-    unread_resp = client.get(f"/messages/unread/{recipient2['email']}")
+    unread_resp = await aclient.get(f"/messages/unread/{recipient2['email']}")
     assert unread_resp.status_code == 200
-    unread = unread_resp.json()
-    assert any(m["id"] == message_id for m in unread)
+    unread = {m["id"]: m for m in unread_resp.json()}
+    assert message_id in unread
 
-    client.patch(
+    await aclient.patch(
         f"/messages/read/{message_id}", params={"recipient_email": recipient2["email"]}
     )
 
-    unread_resp2 = client.get(f"/messages/unread/{recipient2['email']}")
+    unread_resp2 = await aclient.get(f"/messages/unread/{recipient2['email']}")
     assert unread_resp2.status_code == 200
-    unread2 = unread_resp2.json()
-    assert all(m["id"] != message_id for m in unread2)
+    unread2 = {m["id"]: m for m in unread_resp2.json()}
+    assert message_id not in unread2
 
 
-def test_get_message_with_recipients(sample_message):
+async def test_get_message_with_recipients(aclient, sample_message):
     message_id, (sender, recipient1, recipient2) = sample_message
-    response = client.get(f"/messages/{message_id}")
+    response = await aclient.get(f"/messages/{message_id}")
     assert response.status_code == 200
     data = response.json()
     assert data["id"] == message_id
     assert data["sender_email"] == sender["email"]
     assert "recipients" in data
-    recipient_emails = [r["email"] for r in data["recipients"]]
-    assert recipient1["email"] in recipient_emails
-    assert recipient2["email"] in recipient_emails
+    recipients = {r["email"]: r for r in data["recipients"]}
+    assert recipient1["email"] in recipients
+    assert recipient2["email"] in recipients
@@ -1,12 +1,15 @@
+from uuid import uuid4
+
 import pytest
-from fastapi.testclient import TestClient
+from sqlalchemy import update
 
-from app.main import app
+from app.models import User
 
-client = TestClient(app)
+# Nothing here is Postgres-specific; runs on SQLite unless `-m postgres`
+pytestmark = pytest.mark.usefixtures("db_backend")
 
 
-def test_create_user():
+def test_create_user(client):
     payload = {"email": "testuser@example.com", "name": "Test User"}
     response = client.post("/users/", json=payload)
     assert response.status_code == 201
@@ -17,7 +20,22 @@ def test_create_user():
     assert "created_at" in data
 
 
-def test_get_user_by_id():
+def test_create_duplicate_user(client):
+    payload = {"email": "duplicate@example.com", "name": "Duplicate User"}
+    assert client.post("/users/", json=payload).status_code == 201
+
+    response = client.post("/users/", json=payload)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "User with this email already exists."
+
+
+def test_create_user_invalid_email(client):
+    for email in ["no-at-sign.com", "two@@example.com", "user@nodot"]:
+        response = client.post("/users/", json={"email": email, "name": "Bad Email"})
+        assert response.status_code == 422
+
+
+def test_get_user_by_id(client):
     payload = {"email": "getbyid@example.com", "name": "Get By ID"}
     create_resp = client.post("/users/", json=payload)
     assert create_resp.status_code == 201
@@ -32,7 +50,7 @@ def test_get_user_by_id():
     assert "created_at" in data
 
 
-def test_list_users():
+def test_list_users(client):
     payload = {"email": "listuser@example.com", "name": "List User"}
     client.post("/users/", json=payload)
 
@@ -40,4 +58,43 @@ def test_list_users():
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
-    assert any(user["email"] == payload["email"] for user in data)
+    by_email = {user["email"]: user for user in data}
+    assert payload["email"] in by_email
+
+
+def test_user_cache(client, db_session):
+    first = client.post("/users/", json={"email": "cached@example.com", "name": "Old"})
+    user_id = first.json()["id"]
+    assert client.get(f"/users?id={user_id}").json()["name"] == "Old"
+    assert "cached@example.com" in {u["email"] for u in client.get("/users/").json()}
+
+    # Changed behind the repository's back: both lookups still serve the cache
+    db_session.execute(
+        update(User).where(User.email == "cached@example.com").values(name="New")
+    )
+    db_session.flush()
+    assert client.get(f"/users?id={user_id}").json()["name"] == "Old"
+    by_email = {u["email"]: u for u in client.get("/users/").json()}
+    assert by_email["cached@example.com"]["name"] == "Old"
+
+    # Creating another user clears both caches
+    second = client.post(
+        "/users/", json={"email": "other@example.com", "name": "Other"}
+    )
+    assert second.status_code == 201
+    assert client.get(f"/users?id={user_id}").json()["name"] == "New"
+    by_email = {u["email"]: u for u in client.get("/users/").json()}
+    assert by_email["cached@example.com"]["name"] == "New"
+    assert "other@example.com" in by_email
+
+
+def test_user_cache_skips_misses(client, db_session):
+    user_id = uuid4()
+    assert client.get(f"/users?id={user_id}").status_code == 404
+
+    # A miss is not cached, so the user is found once it exists
+    db_session.add(User(id=user_id, email="late@example.com", name="Late"))
+    db_session.flush()
+    response = client.get(f"/users?id={user_id}")
+    assert response.status_code == 200
+    assert response.json()["email"] == "late@example.com"